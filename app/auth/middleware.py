@@ -1,7 +1,7 @@
 from fastapi import Request, HTTPException
 from starlette.middleware.base import BaseHTTPMiddleware
 from sqlalchemy.orm import Session
-from app.db.database import get_db
+from app.db.database import get_user_shard_db
 from app.auth.auth import decode_access_token
 from app.models.user import User
 
@@ -12,7 +12,7 @@ class AuthMiddleware(BaseHTTPMiddleware):
         """Intercepts incoming requests to verify JWT authentication."""
 
         # Bypass authentication for public routes
-        public_routes = {"/", "/auth/login", "/auth/register", "/docs", "/openapi.json"}
+        public_routes = {"/", "/auth/login", "/auth/register", "/docs", "/openapi.json", "/metrics"}
         if request.url.path in public_routes:
             return await call_next(request)
 
@@ -38,8 +38,12 @@ class AuthMiddleware(BaseHTTPMiddleware):
                     raise HTTPException(status_code=401, detail="Invalid user ID in token")
 
             # Attach user to request state
-            db: Session = next(get_db())  # Get database session
-            user = db.query(User).filter(User.id == user_id).first()
+            db_session = get_user_shard_db(user_id)  # Get session on the user's shard
+            db: Session = next(db_session)
+            try:
+                user = db.query(User).filter(User.id == user_id).first()
+            finally:
+                db_session.close()  # Give the connection back before the request runs
 
             if not user:
                 raise HTTPException(status_code=401, detail="User not found")
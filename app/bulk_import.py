@@ -0,0 +1,312 @@
+"""Bulk import of users and orders: ``python -m app.bulk_import users customers.csv``.
+
+Rows are streamed from CSV (with a header) or NDJSON, validated in batches with
+the API schemas and written with Postgres COPY (executemany on other databases).
+Invalid rows are reported back instead of aborting the load.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+from collections import defaultdict
+from contextlib import contextmanager
+from itertools import islice
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from app.auth.auth import pwd_context, hash_password
+from app.db.database import shard_router
+from app.models.user import User
+from app.models.order import Order
+from app.schemas.user import UserImportRow
+from app.schemas.order import OrderImportRow
+
+BATCH_SIZE = 1000
+MAX_BATCH_SIZE = 10000
+MAX_REPORTED_REJECTS = 1000
+FORMATS = ("csv", "ndjson")
+
+
+class ImportReport:
+    """Counts imported rows and keeps the first rejected ones with their errors."""
+
+    def __init__(self):
+        self.imported = 0
+        self.rejected = 0
+        self.rejects = []
+
+    def reject(self, line: int, errors: list[str]):
+        self.rejected += 1
+        if len(self.rejects) < MAX_REPORTED_REJECTS:
+            self.rejects.append({"line": line, "errors": errors})
+
+    def as_dict(self) -> dict:
+        rejects = sorted(self.rejects, key=lambda reject: reject["line"])
+        return {"imported": self.imported, "rejected": self.rejected, "rejects": rejects}
+
+
+def _read_csv(file):
+    reader = csv.DictReader(file)
+    for record in reader:
+        # Empty cells mean "not given" so that schema defaults apply
+        yield reader.line_num, {key: value for key, value in record.items() if key and value not in ("", None)}, None
+
+def _read_ndjson(file):
+    for line, text in enumerate(file, start=1):
+        if not text.strip():
+            continue
+        try:
+            record = json.loads(text)
+        except json.JSONDecodeError as e:
+            yield line, None, f"Invalid JSON: {e.msg}"
+            continue
+        if not isinstance(record, dict):
+            yield line, None, "Expected a JSON object"
+            continue
+        yield line, record, None
+
+def read_records(file, fmt: str):
+    """Yield (line, record, error) for every row of a CSV or NDJSON text file.
+
+    Input that cannot be read past some point (not UTF-8, malformed CSV) ends with
+    one error for the line after the last row read.
+    """
+    line = 0
+    try:
+        for line, record, error in (_read_csv(file) if fmt == "csv" else _read_ndjson(file)):
+            yield line, record, error
+    except UnicodeDecodeError as e:
+        yield line + 1, None, f"Input is not valid UTF-8 ({e.reason}), import stopped"
+    except csv.Error as e:
+        yield line + 1, None, f"Malformed CSV ({e}), import stopped"
+
+def _batches(records, size: int):
+    records = iter(records)
+    while batch := list(islice(records, size)):
+        yield batch
+
+def _validate(batch, schema, report: ImportReport) -> list:
+    """Validate a batch of records, rejecting the invalid ones."""
+    valid = []
+    for line, record, error in batch:
+        if error:
+            report.reject(line, [error])
+            continue
+        try:
+            valid.append((line, schema.model_validate(record)))
+        except ValidationError as e:
+            report.reject(line, [
+                f"{'.'.join(map(str, err['loc']))}: {err['msg']}" if err["loc"] else err["msg"]
+                for err in e.errors()
+            ])
+    return valid
+
+@contextmanager
+def _shard_sessions():
+    sessions = [shard_router.session(shard) for shard in range(shard_router.shard_count)]
+    try:
+        yield sessions
+    finally:
+        for db in sessions:
+            db.close()
+
+def _scatter_rows(query) -> list:
+    """Run a select on every shard and return all result rows."""
+    with _shard_sessions() as sessions:
+        per_shard = shard_router.scatter(sessions, lambda db: db.execute(query).all())
+    return [row for rows in per_shard for row in rows]
+
+
+def _copy_rows(connection, table, columns: tuple, rows: list[dict]):
+    """Stream rows into a Postgres table with COPY ... FROM STDIN."""
+    buffer = io.StringIO()
+    # None becomes an unquoted empty field, which COPY reads as NULL
+    csv.writer(buffer).writerows([row[column] for column in columns] for row in rows)
+    buffer.seek(0)
+
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+def _insert_rows(connection, table, rows: list[dict]):
+    """Insert rows with COPY on Postgres (psycopg2) and executemany everywhere else."""
+    # Rows leaving out a column must not send NULL for it, so write each column set separately
+    by_columns = defaultdict(list)
+    for row in rows:
+        by_columns[tuple(row)].append(row)
+
+    for columns, group in by_columns.items():
+        if connection.dialect.name == "postgresql" and connection.dialect.driver == "psycopg2":
+            _copy_rows(connection, table, columns, group)
+        else:
+            connection.execute(insert(table), group)
+
+def _write_rows(engine, table, rows: list, report: ImportReport):
+    """Write (line, row) pairs in one transaction, splitting them on failure until only the bad rows are rejected."""
+    try:
+        with engine.begin() as connection:
+            _insert_rows(connection, table, [row for _, row in rows])
+    except (SQLAlchemyError, engine.dialect.dbapi.Error) as e:
+        if len(rows) == 1:
+            report.reject(rows[0][0], [f"Database error: {str(e).splitlines()[0]}"])
+            return
+        # Don't reject the whole batch for one bad row, retry each half in its own transaction
+        middle = len(rows) // 2
+        _write_rows(engine, table, rows[:middle], report)
+        _write_rows(engine, table, rows[middle:], report)
+    else:
+        report.imported += len(rows)
+
+def _write(table, rows_by_shard: dict, report: ImportReport):
+    """Write one batch, one transaction per shard."""
+    for shard, rows in rows_by_shard.items():
+        _write_rows(shard_router.engines[shard], table, rows, report)
+
+
+def import_users(file, fmt: str = "csv", batch_size: int = BATCH_SIZE) -> dict:
+    """Import users from a CSV/NDJSON file. Rows carry either `password` or a bcrypt `hashed_password`."""
+    report = ImportReport()
+    seen_emails, seen_usernames = set(), set()
+
+    for batch in _batches(read_records(file, fmt), batch_size):
+        candidates = _validate(batch, UserImportRow, report)
+        if not candidates:
+            continue
+
+        emails = {user.email for _, user in candidates}
+        usernames = {user.username for _, user in candidates}
+        existing = _scatter_rows(
+            select(User.email, User.username).where(User.email.in_(emails) | User.username.in_(usernames))
+        )
+        taken_emails = seen_emails | {row.email for row in existing}
+        taken_usernames = seen_usernames | {row.username for row in existing}
+
+        rows_by_shard = defaultdict(list)
+        for line, user in candidates:
+            errors = []
+            if user.email in taken_emails:
+                errors.append("email: Email already registered")
+            if user.username in taken_usernames:
+                errors.append("username: Username already taken")
+            if user.hashed_password is not None and pwd_context.identify(user.hashed_password) is None:
+                errors.append("hashed_password: Unrecognized password hash")
+            if errors:
+                report.reject(line, errors)
+                continue
+
+            taken_emails.add(user.email)
+            taken_usernames.add(user.username)
+            seen_emails.add(user.email)
+            seen_usernames.add(user.username)
+
+            shard = shard_router.shard_for_new_user()
+            rows_by_shard[shard].append((line, {
+                "id": shard_router.next_id(shard),
+                "username": user.username,
+                "email": user.email,
+                "hashed_password": user.hashed_password or hash_password(user.password),
+                "role": user.role,
+            }))
+
+        _write(User.__table__, rows_by_shard, report)
+
+    return report.as_dict()
+
+def import_orders(file, fmt: str = "csv", batch_size: int = BATCH_SIZE) -> dict:
+    """Import orders from a CSV/NDJSON file. Each row names its owner by `user_id` or `user_email`."""
+    report = ImportReport()
+
+    for batch in _batches(read_records(file, fmt), batch_size):
+        candidates = _validate(batch, OrderImportRow, report)
+        if not candidates:
+            continue
+
+        # Resolve owners with one IN query per shard
+        emails = {order.user_email for _, order in candidates if order.user_email is not None}
+        user_ids = list({order.user_id for _, order in candidates if order.user_id is not None})
+        owners_by_email = {}
+        if emails:
+            owners_by_email = {row.email: row.id for row in _scatter_rows(select(User.email, User.id).where(User.email.in_(emails)))}
+        known_ids = set()
+        if user_ids:
+            with _shard_sessions() as sessions:
+                known_ids = {
+                    row.id for row in shard_router.get_many(
+                        sessions, user_ids, lambda db, shard_ids: db.execute(select(User.id).where(User.id.in_(shard_ids))).all()
+                    )
+                }
+
+        rows_by_shard = defaultdict(list)
+        for line, order in candidates:
+            owner_id = order.user_id if order.user_id is not None else owners_by_email.get(order.user_email)
+            if owner_id is None or (order.user_id is not None and owner_id not in known_ids):
+                report.reject(line, ["User not found"])
+                continue
+
+            # Orders live on their owner's shard
+            shard = shard_router.shard_for_id(owner_id)
+            row = {
+                "id": shard_router.next_id(shard),
+                "user_id": owner_id,
+                "total_amount": order.total_amount,
+                "status": order.status,
+            }
+            if order.order_date is not None:
+                row["order_date"] = order.order_date
+            rows_by_shard[shard].append((line, row))
+
+        _write(Order.__table__, rows_by_shard, report)
+
+    return report.as_dict()
+
+IMPORTERS = {"users": import_users, "orders": import_orders}
+
+
+def format_from_content_type(content_type: str):
+    """Pick the input format from a request Content-Type (None if unsupported)."""
+    if "csv" in content_type:
+        return "csv"
+    if "json" in content_type:
+        return "ndjson"
+    return None
+
+async def spool_request_body(request):
+    """Stream a request body to a temporary file and return it opened as text."""
+    spool = tempfile.TemporaryFile("w+b")
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+    return io.TextIOWrapper(spool, encoding="utf-8", newline="")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import users or orders from CSV or NDJSON.")
+    parser.add_argument("kind", choices=sorted(IMPORTERS))
+    parser.add_argument("path", help="Input file, or - for stdin")
+    parser.add_argument("--format", choices=FORMATS, help="Input format (default: from the file extension, else csv)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    if "ID_WORKER_ID" not in os.environ:
+        # Worker 0 is also the first server worker's, the same millisecond would give both the same IDs
+        print("Warning: ID_WORKER_ID is not set, generating IDs as worker 0. "
+              "Use a worker id no running server process has.", file=sys.stderr)
+
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl", ".json")) else "csv")
+    if args.path == "-":
+        report = IMPORTERS[args.kind](sys.stdin, fmt, args.batch_size)
+    else:
+        with open(args.path, encoding="utf-8", newline="") as file:
+            report = IMPORTERS[args.kind](file, fmt, args.batch_size)
+
+    print(json.dumps(report, indent=2))
+    return 1 if report["rejected"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,26 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from fastapi import Request
+from sqlalchemy.orm import declarative_base
 import os
 from dotenv import load_dotenv
+from app.db.sharding import ShardRouter, shard_urls_from_env
 
 load_dotenv()
 
 # Load database URL from .env
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-# Create the database engine
-engine = create_engine(DATABASE_URL)
+# Create one engine per shard (SHARD_DATABASE_URLS, or just DATABASE_URL)
+shard_router = ShardRouter(
+    shard_urls_from_env(),
+    # Must be unique per writing process across all hosts (app.serve assigns one per worker)
+    worker_id=int(os.getenv("ID_WORKER_ID", 0)),
+)
+
+# The first shard keeps the pre-sharding data and serves unsharded lookups
+engine = shard_router.engines[0]
 
 # Create a session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = shard_router.sessionmakers[0]
 
 # Base class for models
 Base = declarative_base()
@@ -24,4 +32,35 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_shard_db(shard: int):
+    """Yield a session on the given shard and ensure it's closed after use."""
+    db = shard_router.session(shard)
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_user_db(request: Request):
+    """Yield a session on the shard of the currently logged-in user."""
+    user = getattr(request.state, "user", None)
+    shard = shard_router.shard_for_id(user.id) if user else 0
+    yield from get_shard_db(shard)
+
+def get_user_shard_db(user_id: int):
+    """Yield a session on the shard holding the user with the given ID."""
+    yield from get_shard_db(shard_router.shard_for_id(user_id))
+
+def get_order_shard_db(order_id: int):
+    """Yield a session on the shard holding the order with the given ID."""
+    yield from get_shard_db(shard_router.shard_for_id(order_id))
+
+def get_all_dbs():
+    """Yield one session per shard for scatter-gather queries."""
+    sessions = [factory() for factory in shard_router.sessionmakers]
+    try:
+        yield sessions
+    finally:
+        for db in sessions:
+            db.close()
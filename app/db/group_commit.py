@@ -0,0 +1,94 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dotenv import load_dotenv
+from sqlalchemy import insert
+
+load_dotenv()
+
+# Opt-in group commit of concurrent inserts
+GROUP_COMMIT = os.getenv("GROUP_COMMIT", "false").lower() in ("1", "true", "yes")
+GROUP_COMMIT_WINDOW_MS = float(os.getenv("GROUP_COMMIT_WINDOW_MS", 5))
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", 100))
+
+
+class _ShardBatcher:
+    """Collects rows for one shard and writes each batch in a single transaction."""
+
+    def __init__(self, engine, table, window_ms: float, max_batch: int):
+        self.engine = engine
+        self.table = table
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def submit(self, row: dict) -> Future:
+        self._ensure_thread()
+        future = Future()
+        self._queue.put((row, future))
+        return future
+
+    def _ensure_thread(self):
+        # Threads do not survive a fork, so each worker process starts its own
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name=f"group-commit-{self.table.name}", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(items) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self._flush(items)
+
+    def _flush(self, items: list):
+        try:
+            self._insert([row for row, _ in items])
+        except Exception as e:
+            if len(items) == 1:
+                items[0][1].set_exception(e)
+                return
+            # Don't fail every caller for one bad row, give each row its own transaction
+            for row, future in items:
+                try:
+                    self._insert([row])
+                except Exception as row_error:
+                    future.set_exception(row_error)
+                else:
+                    future.set_result(None)
+        else:
+            for _, future in items:
+                future.set_result(None)
+
+    def _insert(self, rows: list[dict]):
+        with self.engine.begin() as connection:
+            connection.execute(insert(self.table), rows)
+
+
+class GroupCommitter:
+    """Coalesce inserts arriving within a short window into one multi-row INSERT and one commit per shard.
+
+    Rows must carry their own primary key (see ShardRouter.next_id) so callers know their ID up front.
+    """
+
+    def __init__(self, table, engines, window_ms: float = GROUP_COMMIT_WINDOW_MS, max_batch: int = GROUP_COMMIT_MAX_BATCH):
+        self._batchers = [_ShardBatcher(engine, table, window_ms, max_batch) for engine in engines]
+
+    def insert(self, shard: int, row: dict):
+        """Insert a row on the given shard, blocking until its batch is committed."""
+        self._batchers[shard].submit(row).result()
@@ -0,0 +1,165 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Global ID layout (63 bits): | timestamp ms (41) | shard (6) | worker (6) | sequence (10) |
+ID_EPOCH_MS = 1735689600000  # 2025-01-01T00:00:00Z
+SHARD_BITS = 6
+WORKER_BITS = 6
+SEQUENCE_BITS = 10
+
+MAX_SHARDS = 1 << SHARD_BITS
+MAX_WORKERS = 1 << WORKER_BITS
+SEQUENCE_MASK = (1 << SEQUENCE_BITS) - 1
+WORKER_SHIFT = SEQUENCE_BITS
+SHARD_SHIFT = SEQUENCE_BITS + WORKER_BITS
+TIMESTAMP_SHIFT = SEQUENCE_BITS + WORKER_BITS + SHARD_BITS
+
+# IDs below this predate sharding (serial IDs) and live on shard 0. Global IDs reach
+# it 2^18 ms (~4.4 minutes) after ID_EPOCH_MS, so every generated ID is above it.
+LEGACY_ID_LIMIT = 1 << 40
+
+
+def shard_from_id(row_id: int) -> int:
+    """Extract the shard index encoded in a global ID. Legacy IDs (below LEGACY_ID_LIMIT) map to shard 0."""
+    if row_id < LEGACY_ID_LIMIT:
+        return 0
+    return (row_id >> SHARD_SHIFT) & (MAX_SHARDS - 1)
+
+
+class IdGenerator:
+    """Generate time-ordered, globally unique IDs that encode the owning shard."""
+
+    def __init__(self, worker_id: int):
+        if not 0 <= worker_id < MAX_WORKERS:
+            raise ValueError(f"ID worker id must be between 0 and {MAX_WORKERS - 1}, got {worker_id}")
+        self.worker_id = worker_id
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+
+    def next_id(self, shard: int) -> int:
+        """Return a new ID for a row stored on the given shard."""
+        with self._lock:
+            now_ms = int(time.time() * 1000) - ID_EPOCH_MS
+            if now_ms < self._last_ms:
+                now_ms = self._last_ms  # Clock moved backwards, keep IDs monotonic
+
+            if now_ms == self._last_ms:
+                self._sequence = (self._sequence + 1) & SEQUENCE_MASK
+                if self._sequence == 0:
+                    # Sequence exhausted for this millisecond, wait for the next one
+                    while now_ms <= self._last_ms:
+                        now_ms = int(time.time() * 1000) - ID_EPOCH_MS
+            else:
+                self._sequence = 0
+
+            self._last_ms = now_ms
+            return (
+                (now_ms << TIMESTAMP_SHIFT)
+                | (shard << SHARD_SHIFT)
+                | (self.worker_id << WORKER_SHIFT)
+                | self._sequence
+            )
+
+
+def _create_shard_engine(url: str):
+    """Create an engine for a single shard."""
+    if url.startswith("sqlite"):
+        # SQLite connections are shared across FastAPI's threadpool
+        return create_engine(url, connect_args={"check_same_thread": False})
+    return create_engine(url)
+
+
+class ShardRouter:
+    """Route database sessions to one of N shards keyed by user ID."""
+
+    def __init__(self, urls: list[str], worker_id: int = 0):
+        if not urls:
+            raise ValueError("At least one shard database URL is required")
+        if len(urls) > MAX_SHARDS:
+            raise ValueError(f"At most {MAX_SHARDS} shards are supported")
+
+        self.engines = [_create_shard_engine(url) for url in urls]
+        self.sessionmakers = [
+            sessionmaker(autocommit=False, autoflush=False, bind=engine) for engine in self.engines
+        ]
+        self.ids = IdGenerator(worker_id)
+        self._placement = itertools.count()
+
+    @property
+    def shard_count(self) -> int:
+        return len(self.engines)
+
+    def shard_for_id(self, row_id: int) -> int:
+        """Shard holding a user (by user ID) or an order (by order ID)."""
+        return shard_from_id(row_id) % self.shard_count
+
+    def shard_for_new_user(self) -> int:
+        """Pick the shard for a newly created user (round-robin)."""
+        return next(self._placement) % self.shard_count
+
+    def next_id(self, shard: int) -> int:
+        """Allocate a globally unique ID for a row stored on the given shard."""
+        return self.ids.next_id(shard)
+
+    def session(self, shard: int):
+        """Open a new session on the given shard."""
+        return self.sessionmakers[shard]()
+
+    def scatter(self, items, query_fn) -> list:
+        """Run query_fn on every item (a shard session, or a tuple starting with one) in parallel.
+
+        Returns the results in the order of items.
+        """
+        if not items:
+            return []
+        if len(items) == 1:
+            return [query_fn(items[0])]
+        with ThreadPoolExecutor(max_workers=len(items)) as executor:
+            return list(executor.map(query_fn, items))
+
+    def find_first(self, sessions, query_fn):
+        """Return the first non-empty result of query_fn across all shards."""
+        for result in self.scatter(sessions, query_fn):
+            if result is not None:
+                return result
+        return None
+
+    def get_many(self, sessions, ids: list[int], query_fn) -> list:
+        """Fetch rows by ID with one query per involved shard, returned in the order of ids.
+
+        query_fn receives a session and that shard's IDs and must return the matching rows.
+        """
+        ids_by_shard: dict[int, list[int]] = {}
+        for row_id in ids:
+            ids_by_shard.setdefault(self.shard_for_id(row_id), []).append(row_id)
+
+        per_shard = self.scatter(
+            [(sessions[shard], shard_ids) for shard, shard_ids in ids_by_shard.items()],
+            lambda pair: query_fn(*pair),
+        )
+        rows_by_id = {row.id: row for rows in per_shard for row in rows}
+        return [rows_by_id[row_id] for row_id in ids if row_id in rows_by_id]
+
+    def scatter_gather(self, sessions, query_fn, skip: int = 0, limit: int = 100) -> list:
+        """Merge ID-ordered results from every shard and return one page of them.
+
+        query_fn receives a session and must return a query ordered by ``id``.
+        """
+        per_shard = self.scatter(sessions, lambda db: query_fn(db).limit(skip + limit).all())
+        merged = heapq.merge(*per_shard, key=lambda row: row.id)
+        return list(itertools.islice(merged, skip, skip + limit))
+
+
+def shard_urls_from_env() -> list[str]:
+    """Read shard URLs from SHARD_DATABASE_URLS, falling back to DATABASE_URL."""
+    urls = os.getenv("SHARD_DATABASE_URLS")
+    if urls:
+        return [url.strip() for url in urls.split(",") if url.strip()]
+    return [os.getenv("DATABASE_URL")]
@@ -1,20 +1,33 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from app.auth.middleware import AuthMiddleware
+from app import metrics
 from app.routes import auth, users, orders
-from app.db.database import engine, Base
+from app.db.database import shard_router
+from app.models import Base
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Close pooled database connections once the server stops serving requests."""
+    yield
+    for shard_engine in shard_router.engines:
+        shard_engine.dispose()
 
-# Create database tables (if not created)
-Base.metadata.create_all(bind=engine)
+app = FastAPI(lifespan=lifespan)
+
+# Create database tables on every shard (if not created)
+for shard_engine in shard_router.engines:
+    Base.metadata.create_all(bind=shard_engine)
 
 # Register middleware
 app.add_middleware(AuthMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)  # Outermost, so rejected requests are counted too
 
 # Register routes
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(orders.router)
+app.include_router(metrics.router)
 
 
 @app.get("/")
@@ -0,0 +1,42 @@
+"""Prometheus request metrics, exposed on ``GET /metrics``.
+
+With PROMETHEUS_MULTIPROC_DIR set (as ``python -m app.serve`` does for its
+workers), every process writes its samples there and ``/metrics`` reports the
+sum over all workers instead of just the one that answered the scrape.
+"""
+import os
+import time
+from fastapi import APIRouter, Request, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+from starlette.middleware.base import BaseHTTPMiddleware
+
+REQUESTS = Counter("http_requests_total", "HTTP requests handled", ["method", "route", "status"])
+REQUEST_DURATION = Histogram("http_request_duration_seconds", "Time spent handling HTTP requests", ["method", "route"])
+
+router = APIRouter(tags=["Metrics"])
+
+class MetricsMiddleware(BaseHTTPMiddleware):
+    """Count requests and time them, labelled by route template (e.g. /orders/{order_id})."""
+
+    async def dispatch(self, request: Request, call_next):
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            # The router records the matched route in the scope; unmatched paths share one label
+            route = request.scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            REQUESTS.labels(request.method, path, str(status)).inc()
+            REQUEST_DURATION.labels(request.method, path).observe(time.perf_counter() - start)
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    """Serve the metrics of every worker in the Prometheus text format."""
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
+from typing import List
 from datetime import timedelta
 from pydantic import BaseModel, EmailStr
 from app.models.user import User
-from app.db.database import get_db
+from app.db.database import shard_router, get_all_dbs
 from app.auth.auth import hash_password, verify_password, create_access_token
+from app.routes.uniqueness import ensure_unique_user
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -19,23 +21,25 @@ class LoginRequest(BaseModel):
     password: str
 
 @router.post("/register")
-def register(request: RegisterRequest, db: Session = Depends(get_db)):
+def register(request: RegisterRequest, dbs: List[Session] = Depends(get_all_dbs)):
     """Register a new user."""
-    existing_user = db.query(User).filter(User.email == request.email).first()
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
+    ensure_unique_user(dbs, request.email, request.username)
     
     hashed_pw = hash_password(request.password)
-    new_user = User(username=request.username, email=request.email, hashed_password=hashed_pw)
+    shard = shard_router.shard_for_new_user()
+    db = dbs[shard]
+    new_user = User(id=shard_router.next_id(shard), username=request.username, email=request.email, hashed_password=hashed_pw)
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
     return {"message": "User registered successfully"}
 
 @router.post("/login")
-def login(request: LoginRequest, db: Session = Depends(get_db)):
+def login(request: LoginRequest, dbs: List[Session] = Depends(get_all_dbs)):
     """Authenticate user and return JWT token."""
-    user = db.query(User).filter(User.email == request.email).first()
+    user = shard_router.find_first(
+        dbs, lambda db: db.query(User).filter(User.email == request.email).first()
+    )
     if not user or not verify_password(request.password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
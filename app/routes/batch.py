@@ -0,0 +1,14 @@
+from typing import List, Optional
+from fastapi import HTTPException, Query
+
+MAX_BATCH_IDS = 100
+
+def batch_ids(ids: Optional[List[int]] = Query(None, description="IDs to fetch in one request, e.g. ?ids=1&ids=2")) -> Optional[List[int]]:
+    """Parse the ids of a batch multi-get, dropping duplicates but keeping their order."""
+    if ids is None:
+        return None
+
+    unique_ids = list(dict.fromkeys(ids))
+    if len(unique_ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids can be fetched at once")
+    return unique_ids
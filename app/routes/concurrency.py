@@ -0,0 +1,20 @@
+from typing import Optional
+from fastapi import Header, HTTPException
+
+def if_match_version(if_match: Optional[str] = Header(None)) -> Optional[int]:
+    """Parse the row version a client expects from the If-Match header (None means unconditional)."""
+    if if_match is None or if_match.strip() == "*":
+        return None
+
+    tag = if_match.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    tag = tag.strip('"')
+
+    if not tag.isdigit():
+        raise HTTPException(status_code=400, detail="If-Match must be a version ETag such as \"3\"")
+    return int(tag)
+
+def etag(version: int) -> str:
+    """Format a row version as an ETag header value."""
+    return f'"{version}"'
@@ -1,13 +1,23 @@
-from fastapi import APIRouter, Request, HTTPException, Depends
-from sqlalchemy.orm import Session
-from app.db.database import get_db
+from fastapi import APIRouter, Request, Response, HTTPException, Depends, Query
+from sqlalchemy import update
+from sqlalchemy.orm import Session, selectinload, noload
+from typing import List, Optional
+from app.db.database import shard_router, get_user_db, get_order_shard_db, get_all_dbs
+from app.db.group_commit import GroupCommitter, GROUP_COMMIT
 from app.models.order import Order
-from app.schemas.order import OrderCreate, OrderResponse, UpdateOrderRequest
+from app.schemas.order import OrderCreate, OrderResponse, OrderWithUserResponse, UpdateOrderRequest
+from app.routes.concurrency import if_match_version, etag
+from app.routes.batch import batch_ids
+from fastapi.concurrency import run_in_threadpool
+from app import bulk_import
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
-@router.get("/me")
-def list_my_orders(request: Request, db: Session = Depends(get_db)):
+# Batch concurrent order inserts into shared transactions when GROUP_COMMIT is enabled
+order_group_commit = GroupCommitter(Order.__table__, shard_router.engines) if GROUP_COMMIT else None
+
+@router.get("/me", response_model=List[OrderResponse])
+def list_my_orders(request: Request, db: Session = Depends(get_user_db)):
     """List orders placed by the currently logged-in customer."""
 
     if not hasattr(request.state, "user") or not request.state.user:
@@ -23,7 +33,7 @@ def list_my_orders(request: Request, db: Session = Depends(get_db)):
     return orders
 
 @router.post("/", response_model=dict)
-def create_order(request: Request, order_data: OrderCreate, db: Session = Depends(get_db)):
+def create_order(request: Request, order_data: OrderCreate, db: Session = Depends(get_user_db)):
     """Create a new order for the logged-in customer."""
     
     # Ensure user is authenticated
@@ -32,8 +42,17 @@ def create_order(request: Request, order_data: OrderCreate, db: Session = Depend
 
     user = request.state.user  # Authenticated user
 
-    # Create new order
+    # Create new order on the owner's shard
+    shard = shard_router.shard_for_id(user.id)
+    order_id = shard_router.next_id(shard)
+
+    if order_group_commit:
+        # Returns once the batch holding this order is committed
+        order_group_commit.insert(shard, {"id": order_id, "user_id": user.id, "total_amount": order_data.total_amount})
+        return {"message": "Order created successfully", "order_id": str(order_id)}
+
     new_order = Order(
+        id=order_id,
         user_id=user.id,
         total_amount=order_data.total_amount,
     )
@@ -42,10 +61,10 @@ def create_order(request: Request, order_data: OrderCreate, db: Session = Depend
     db.commit()
     db.refresh(new_order)
 
-    return {"message": "Order created successfully", "order_id": new_order.id}
+    return {"message": "Order created successfully", "order_id": str(new_order.id)}
 
 @router.get("/{order_id}", response_model=OrderResponse)
-def get_order(order_id: int, request: Request, db: Session = Depends(get_db)):
+def get_order(order_id: int, request: Request, response: Response, db: Session = Depends(get_order_shard_db)):
     """Retrieve order details by ID."""
     
     # Ensure user is authenticated
@@ -63,33 +82,62 @@ def get_order(order_id: int, request: Request, db: Session = Depends(get_db)):
     if user.role != "admin" and order.user_id != user.id:
         raise HTTPException(status_code=403, detail="Access denied")
 
+    response.headers["ETag"] = etag(order.version)
     return order
 
 @router.put("/{order_id}")
-def update_order(order_id: int, request: Request, order_data: UpdateOrderRequest, db: Session = Depends(get_db)):
-    """Update order details by ID (Admin, Customer for own orders)."""
+def update_order(
+    order_id: int,
+    request: Request,
+    response: Response,
+    order_data: UpdateOrderRequest,
+    expected_version: Optional[int] = Depends(if_match_version),
+    db: Session = Depends(get_order_shard_db),
+):
+    """Update order details by ID (Admin, Customer for own orders).
+
+    Send `If-Match: "<version>"` to only apply the update if nobody changed the order since it was read.
+    """
 
     if not hasattr(request.state, "user") or not request.state.user:
         raise HTTPException(status_code=401, detail="Authentication required")
 
     user = request.state.user
 
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-
-    # Customers can only update their own orders
-    if user.role != "admin" and order.user_id != user.id:
-        raise HTTPException(status_code=403, detail="You can only update your own orders")
+    # Single conditional UPDATE, no prior SELECT
+    stmt = update(Order).where(Order.id == order_id)
+    if user.role != "admin":
+        stmt = stmt.where(Order.user_id == user.id)  # Customers can only update their own orders
+    if expected_version is not None:
+        stmt = stmt.where(Order.version == expected_version)
+    stmt = (
+        stmt.values(status=order_data.status, version=Order.version + 1)
+        .returning(Order.id, Order.status, Order.version)
+        .execution_options(synchronize_session=False)
+    )
+    updated = db.execute(stmt).first()
+
+    if not updated:
+        # Nothing matched, find out why
+        db.rollback()
+        order = db.query(Order.user_id, Order.version).filter(Order.id == order_id).first()
+        if not order:
+            raise HTTPException(status_code=404, detail="Order not found")
+        if user.role != "admin" and order.user_id != user.id:
+            raise HTTPException(status_code=403, detail="You can only update your own orders")
+        raise HTTPException(
+            status_code=409,
+            detail="Order was modified by another request",
+            headers={"ETag": etag(order.version)},
+        )
 
-    order.status = order_data.status
     db.commit()
-    db.refresh(order)
 
-    return {"message": "Order updated successfully", "order_id": order.id, "status": order.status}
+    response.headers["ETag"] = etag(updated.version)
+    return {"message": "Order updated successfully", "order_id": str(updated.id), "status": updated.status, "version": updated.version}
 
 @router.delete("/{order_id}")
-def delete_order(order_id: int, request: Request, db: Session = Depends(get_db)):
+def delete_order(order_id: int, request: Request, db: Session = Depends(get_order_shard_db)):
     """Delete an order by ID (Admin, Customer for own orders)."""
 
     if not hasattr(request.state, "user") or not request.state.user:
@@ -111,17 +159,71 @@ def delete_order(order_id: int, request: Request, db: Session = Depends(get_db))
     return {"message": "Order deleted successfully"}
 
 @router.get("/")
-def list_orders(request: Request, db: Session = Depends(get_db)):
-    """List all orders (Admin only)."""
+def list_orders(
+    request: Request,
+    ids: Optional[List[int]] = Depends(batch_ids),
+    include_user: bool = False,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    dbs: List[Session] = Depends(get_all_dbs),
+):
+    """List all orders across shards, oldest first (Admin only).
+
+    With `?ids=1&ids=2` fetch just those orders instead (Admin, Customer for own orders),
+    optionally embedding each order's user with `include_user=true`.
+    """
 
     if not hasattr(request.state, "user") or not request.state.user:
         raise HTTPException(status_code=401, detail="Authentication required")
 
     user = request.state.user
 
+    if ids is not None:
+        return _get_orders_by_ids(user, ids, include_user, dbs)
+
     if user.role != "admin":
         raise HTTPException(status_code=403, detail="Only admins can list all orders")
 
-    orders = db.query(Order).all()
+    orders = shard_router.scatter_gather(dbs, lambda db: db.query(Order).order_by(Order.id), skip, limit)
 
-    return orders
+    return [OrderResponse.model_validate(order, from_attributes=True) for order in orders]
+
+def _get_orders_by_ids(user, ids: List[int], include_user: bool, dbs: List[Session]):
+    """Fetch many orders with one IN query per shard, skipping ones the user may not see."""
+
+    def query_shard(db: Session, shard_ids: List[int]):
+        query = db.query(Order).filter(Order.id.in_(shard_ids))
+        # Customers only get their own orders, like get_order
+        if user.role != "admin":
+            query = query.filter(Order.user_id == user.id)
+        # Owners live on the same shard, so they load in one extra query per shard
+        query = query.options(selectinload(Order.user) if include_user else noload(Order.user))
+        return query.all()
+
+    orders = shard_router.get_many(dbs, ids, query_shard)
+
+    schema = OrderWithUserResponse if include_user else OrderResponse
+    return [schema.model_validate(order, from_attributes=True) for order in orders]
+
+@router.post("/import")
+async def bulk_import_orders(request: Request, batch_size: int = Query(bulk_import.BATCH_SIZE, ge=1, le=bulk_import.MAX_BATCH_SIZE)):
+    """Bulk import orders from a CSV (text/csv) or NDJSON (application/x-ndjson) body (Admin only).
+
+    Rows are validated like `POST /orders` and name their owner by `user_id` or `user_email`.
+    Invalid rows are reported back without aborting the rest of the import.
+    """
+
+    # Ensure user is authenticated
+    if not hasattr(request.state, "user") or not request.state.user:
+        raise HTTPException(status_code=401, detail="Authentication required")
+
+    # Only admins can import orders
+    if request.state.user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can import orders")
+
+    fmt = bulk_import.format_from_content_type(request.headers.get("content-type", ""))
+    if fmt is None:
+        raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson")
+
+    with await bulk_import.spool_request_body(request) as file:
+        return await run_in_threadpool(bulk_import.import_orders, file, fmt, batch_size)
@@ -0,0 +1,24 @@
+from typing import List, Optional
+from fastapi import HTTPException
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+from app.db.database import shard_router
+from app.models.user import User
+
+def ensure_unique_user(dbs: List[Session], email: str, username: str, exclude_id: Optional[int] = None, email_detail: str = "Email already registered"):
+    """Reject an email or username that another user holds on any shard.
+
+    Each shard only enforces uniqueness for its own rows, so every write that sets
+    a user's email or username must check all shards first.
+    """
+    def taken(db: Session):
+        stmt = select(User.email, User.username).where(or_(User.email == email, User.username == username))
+        if exclude_id is not None:
+            stmt = stmt.where(User.id != exclude_id)
+        return db.execute(stmt).all()
+
+    rows = [row for rows in shard_router.scatter(dbs, taken) for row in rows]
+    if any(row.email == email for row in rows):
+        raise HTTPException(status_code=400, detail=email_detail)
+    if any(row.username == username for row in rows):
+        raise HTTPException(status_code=400, detail="Username already taken")
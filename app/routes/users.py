@@ -1,17 +1,51 @@
-from fastapi import APIRouter, Request, HTTPException, Depends
+from fastapi import APIRouter, Request, Response, HTTPException, Depends, Query
 from pydantic import BaseModel, EmailStr
+from sqlalchemy import update
 from sqlalchemy.orm import Session
-from app.db.database import get_db
+from app.db.database import shard_router, get_user_db, get_user_shard_db, get_all_dbs
 from app.models.user import User
 from app.models.order import Order
 from app.auth.auth import hash_password
-from typing import List
+from typing import List, Optional
 from app.schemas.user import UserResponse, UserRequest, UpdateUserRequest
+from app.schemas.order import OrderResponse
+from app.routes.concurrency import if_match_version, etag
+from app.routes.batch import batch_ids
+from app.routes.uniqueness import ensure_unique_user
+from fastapi.concurrency import run_in_threadpool
+from app import bulk_import
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
-@router.get("/{user_id}/orders")
-def list_user_orders(user_id: int, request: Request, db: Session = Depends(get_db)):
+def _update_user_fields(db: Session, user_id: int, user_data: UpdateUserRequest, expected_version: Optional[int]):
+    """Apply a profile update as one conditional UPDATE, raising 404/409 when no row matches."""
+    stmt = update(User).where(User.id == user_id)
+    if expected_version is not None:
+        stmt = stmt.where(User.version == expected_version)
+    stmt = (
+        stmt.values(username=user_data.username, email=user_data.email, version=User.version + 1)
+        .returning(User.id, User.username, User.email, User.version)
+        .execution_options(synchronize_session=False)
+    )
+    updated = db.execute(stmt).first()
+
+    if not updated:
+        # Nothing matched, find out why
+        db.rollback()
+        current_version = db.query(User.version).filter(User.id == user_id).scalar()
+        if current_version is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        raise HTTPException(
+            status_code=409,
+            detail="User was modified by another request",
+            headers={"ETag": etag(current_version)},
+        )
+
+    db.commit()
+    return updated
+
+@router.get("/{user_id}/orders", response_model=List[OrderResponse])
+def list_user_orders(user_id: int, request: Request, db: Session = Depends(get_user_shard_db)):
     """List orders placed by a specific user (Admin only)."""
 
     if not hasattr(request.state, "user") or not request.state.user:
@@ -22,12 +56,12 @@ def list_user_orders(user_id: int, request: Request, db: Session = Depends(get_d
     if user.role != "admin":
         raise HTTPException(status_code=403, detail="Only admins can list orders of other users")
 
-    orders = db.query(Order).all()#.filter(Order.user_id == int(user_id)).all()
+    orders = db.query(Order).filter(Order.user_id == user_id).all()
 
     return orders
 
 @router.get("/me", response_model=UserResponse)
-def get_profile(request: Request):
+def get_profile(request: Request, response: Response):
     """Get current logged-in user profile. Only accessible by customers."""
 
     # Ensure request.state.user is set by middleware
@@ -40,44 +74,40 @@ def get_profile(request: Request):
     if user.role != "customer":
         raise HTTPException(status_code=403, detail="Only customers can access this route")
 
+    response.headers["ETag"] = etag(user.version)
     return user  # FastAPI automatically converts SQLAlchemy model to Pydantic
 
 @router.put("/me")
-def update_profile(request: Request, update_data: UpdateUserRequest, db: Session = Depends(get_db)):
-    """Update the currently logged-in user's profile (Customer only)."""
+def update_profile(
+    request: Request,
+    response: Response,
+    update_data: UpdateUserRequest,
+    expected_version: Optional[int] = Depends(if_match_version),
+    db: Session = Depends(get_user_db),
+    dbs: List[Session] = Depends(get_all_dbs),
+):
+    """Update the currently logged-in user's profile (Customer only). Supports If-Match."""
 
     # Ensure user is authenticated
     if not hasattr(request.state, "user") or not request.state.user:
         raise HTTPException(status_code=401, detail="Authentication required")
 
-    logged_in_user = request.state.user
-
-    # Re-fetch the user inside this DB session
-    user = db.query(User).filter(User.id == logged_in_user.id).first()
-
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    user = request.state.user
 
     # Only customers can update their profile
     if user.role != "customer":
         raise HTTPException(status_code=403, detail="Only customers can update their profile")
 
-    # Check if the new email already exists (excluding current user's email)
-    existing_user = db.query(User).filter(User.email == update_data.email, User.id != user.id).first()
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Email already in use")
+    # Check if the new email or username is already taken on any shard (excluding the current user)
+    ensure_unique_user(dbs, update_data.email, update_data.username, exclude_id=user.id, email_detail="Email already in use")
 
-    # Update user fields
-    user.username = update_data.username
-    user.email = update_data.email
+    updated = _update_user_fields(db, user.id, update_data, expected_version)
 
-    db.commit()
-    db.refresh(user)
-
-    return {"message": "Profile updated successfully", "id": user.id, "username": user.username, "email": user.email}
+    response.headers["ETag"] = etag(updated.version)
+    return {"message": "Profile updated successfully", "id": str(updated.id), "username": updated.username, "email": updated.email, "version": updated.version}
 
 @router.post("/", status_code=201)
-def create_user(request: Request, user_data: UserRequest, db: Session = Depends(get_db)):
+def create_user(request: Request, user_data: UserRequest, dbs: List[Session] = Depends(get_all_dbs)):
     """Create a new user. Only Admins can access this API."""
     
     # Ensure request.state.user is set by middleware
@@ -90,14 +120,15 @@ def create_user(request: Request, user_data: UserRequest, db: Session = Depends(
     if logged_in_user.role != "admin":
         raise HTTPException(status_code=403, detail="Only admins can create users")
 
-    # Check if the email already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
+    # Check if the email or username already exists on any shard
+    ensure_unique_user(dbs, user_data.email, user_data.username)
 
-    # Hash password and create user
+    # Hash password and create user on the next shard
     hashed_pw = hash_password(user_data.password)
+    shard = shard_router.shard_for_new_user()
+    db = dbs[shard]
     new_user = User(
+        id=shard_router.next_id(shard),
         username=user_data.username,
         email=user_data.email,
         hashed_password=hashed_pw,
@@ -108,10 +139,10 @@ def create_user(request: Request, user_data: UserRequest, db: Session = Depends(
     db.commit()
     db.refresh(new_user)
 
-    return {"message": "User created successfully", "id": new_user.id}
+    return {"message": "User created successfully", "id": str(new_user.id)}
 
 @router.get("/{user_id}")
-def get_user(user_id: int, request: Request, db: Session = Depends(get_db)):
+def get_user(user_id: int, request: Request, response: Response, db: Session = Depends(get_user_shard_db)):
     """Retrieve user details by ID. Admins can access any user, customers can only access their own profile."""
     
     # Ensure user is authenticated
@@ -128,11 +159,20 @@ def get_user(user_id: int, request: Request, db: Session = Depends(get_db)):
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    return {"id": user.id, "username": user.username, "email": user.email, "role": user.role}
+    response.headers["ETag"] = etag(user.version)
+    return {"id": str(user.id), "username": user.username, "email": user.email, "role": user.role, "version": user.version}
 
 @router.put("/{user_id}")
-def update_user(user_id: int, request: Request, user_data: UpdateUserRequest, db: Session = Depends(get_db)):
-    """Update user details by ID. Admins can update any user, customers can only update their own profile."""
+def update_user(
+    user_id: int,
+    request: Request,
+    response: Response,
+    user_data: UpdateUserRequest,
+    expected_version: Optional[int] = Depends(if_match_version),
+    db: Session = Depends(get_user_shard_db),
+    dbs: List[Session] = Depends(get_all_dbs),
+):
+    """Update user details by ID. Admins can update any user, customers can only update their own profile. Supports If-Match."""
     
     # Ensure user is authenticated
     if not hasattr(request.state, "user") or not request.state.user:
@@ -144,21 +184,16 @@ def update_user(user_id: int, request: Request, user_data: UpdateUserRequest, db
     if logged_in_user.role != "admin" and logged_in_user.id != user_id:
         raise HTTPException(status_code=403, detail="Access denied")
 
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    # Update fields
-    user.username = user_data.username
-    user.email = user_data.email
+    # Check if the new email or username is already taken on any shard (excluding this user)
+    ensure_unique_user(dbs, user_data.email, user_data.username, exclude_id=user_id, email_detail="Email already in use")
 
-    db.commit()
-    db.refresh(user)
+    updated = _update_user_fields(db, user_id, user_data, expected_version)
 
-    return {"message": "User updated successfully", "id": user.id, "username": user.username, "email": user.email}
+    response.headers["ETag"] = etag(updated.version)
+    return {"message": "User updated successfully", "id": str(updated.id), "username": updated.username, "email": updated.email, "version": updated.version}
 
 @router.delete("/{user_id}")
-def delete_user(user_id: int, request: Request, db: Session = Depends(get_db)):
+def delete_user(user_id: int, request: Request, db: Session = Depends(get_user_shard_db)):
     """Delete a user by ID (Admin only)."""
 
     # Ensure user is authenticated
@@ -187,8 +222,17 @@ def delete_user(user_id: int, request: Request, db: Session = Depends(get_db)):
     return {"message": f"User {user.username} deleted successfully"}
 
 @router.get("/", response_model=List[UserResponse])
-def list_users(request: Request, db: Session = Depends(get_db)):
-    """List all users (Admin only)."""
+def list_users(
+    request: Request,
+    ids: Optional[List[int]] = Depends(batch_ids),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    dbs: List[Session] = Depends(get_all_dbs),
+):
+    """List all users across shards, oldest first (Admin only).
+
+    With `?ids=1&ids=2` fetch just those users instead. Admins can fetch any user, customers only themselves.
+    """
 
     # Ensure user is authenticated
     if not hasattr(request.state, "user") or not request.state.user:
@@ -196,10 +240,39 @@ def list_users(request: Request, db: Session = Depends(get_db)):
 
     logged_in_user = request.state.user
 
+    if ids is not None:
+        # Customers can only see their own details, like get_user
+        if logged_in_user.role != "admin":
+            ids = [user_id for user_id in ids if user_id == logged_in_user.id]
+        return shard_router.get_many(dbs, ids, lambda db, shard_ids: db.query(User).filter(User.id.in_(shard_ids)).all())
+
     # Only admins can list users
     if logged_in_user.role != "admin":
         raise HTTPException(status_code=403, detail="Only admins can list users")
 
-    users = db.query(User).all()
+    users = shard_router.scatter_gather(dbs, lambda db: db.query(User).order_by(User.id), skip, limit)
     
-    return users
\ No newline at end of file
+    return users
+
+@router.post("/import")
+async def bulk_import_users(request: Request, batch_size: int = Query(bulk_import.BATCH_SIZE, ge=1, le=bulk_import.MAX_BATCH_SIZE)):
+    """Bulk import users from a CSV (text/csv) or NDJSON (application/x-ndjson) body (Admin only).
+
+    Rows are validated like `POST /users` but may carry a bcrypt `hashed_password` instead of `password`.
+    Invalid rows are reported back without aborting the rest of the import.
+    """
+
+    # Ensure user is authenticated
+    if not hasattr(request.state, "user") or not request.state.user:
+        raise HTTPException(status_code=401, detail="Authentication required")
+
+    # Only admins can import users
+    if request.state.user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can import users")
+
+    fmt = bulk_import.format_from_content_type(request.headers.get("content-type", ""))
+    if fmt is None:
+        raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson")
+
+    with await bulk_import.spool_request_body(request) as file:
+        return await run_in_threadpool(bulk_import.import_users, file, fmt, batch_size)
@@ -0,0 +1,7 @@
+from typing import Annotated
+from pydantic import PlainSerializer
+
+# Global IDs are larger than 2^53, past which JSON numbers lose precision in JavaScript
+# and other double-based parsers, so responses carry them as strings. Requests may
+# send them either way.
+GlobalId = Annotated[int, PlainSerializer(str, return_type=str, when_used="json")]
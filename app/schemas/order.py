@@ -1,17 +1,37 @@
-from pydantic import BaseModel, condecimal
+from pydantic import BaseModel, EmailStr, condecimal, constr, model_validator
 from datetime import datetime
+from typing import Optional
+from app.schemas.ids import GlobalId
+from app.schemas.user import UserResponse
 
 class OrderCreate(BaseModel):
     total_amount: condecimal(gt=0)
 
 class OrderResponse(BaseModel):
-    id: int
-    user_id: int
+    id: GlobalId
+    user_id: GlobalId
     order_date: datetime
     total_amount: float
     status: str
     created_at: datetime
     updated_at: datetime
+    version: int
+
+class OrderWithUserResponse(OrderResponse):
+    user: Optional[UserResponse] = None
 
 class UpdateOrderRequest(BaseModel):
     status: str
+
+class OrderImportRow(OrderCreate):
+    """An order row of a bulk import, owned by a user given by ID or email."""
+    user_id: Optional[int] = None
+    user_email: Optional[EmailStr] = None
+    status: constr(max_length=50) = "pending"  # Matches the orders.status column
+    order_date: Optional[datetime] = None
+
+    @model_validator(mode="after")
+    def check_owner(self):
+        if (self.user_id is None) == (self.user_email is None):
+            raise ValueError("Provide exactly one of user_id or user_email")
+        return self
@@ -1,10 +1,13 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field, constr, model_validator
+from typing import Optional
+from app.schemas.ids import GlobalId
 
 class UserResponse(BaseModel):
-    id: int
+    id: GlobalId
     username: str
     email: EmailStr
     role: str
+    version: int
 
 class UserRequest(BaseModel):
     username: str
@@ -14,4 +17,19 @@ class UserRequest(BaseModel):
 
 class UpdateUserRequest(BaseModel):
     username: str
-    email: EmailStr
\ No newline at end of file
+    email: EmailStr
+
+class UserImportRow(UserRequest):
+    """A user row of a bulk import, either with a plain password or an existing bcrypt hash."""
+    # Limits match the users columns, so one overlong value can't fail a whole COPY
+    username: constr(max_length=255)
+    email: EmailStr = Field(max_length=255)
+    password: Optional[str] = None
+    hashed_password: Optional[constr(max_length=255)] = None
+    role: constr(max_length=50) = "customer"
+
+    @model_validator(mode="after")
+    def check_password(self):
+        if (self.password is None) == (self.hashed_password is None):
+            raise ValueError("Provide exactly one of password or hashed_password")
+        return self
@@ -0,0 +1,163 @@
+"""Production server entrypoint: ``python -m app.serve``.
+
+Runs the app under gunicorn with uvicorn workers, loading it once in the master
+before forking. Falls back to plain uvicorn when gunicorn is not installed.
+"""
+import glob
+import importlib.util
+import itertools
+import logging
+import os
+import shutil
+import tempfile
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+def _cpu_count() -> int:
+    """Number of cores this process may run on (respects CPU affinity / cgroup pinning)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", 8000))
+# One async worker per core
+WORKERS = int(os.getenv("WEB_CONCURRENCY", 0)) or _cpu_count()
+# Keep idle connections open longer than a typical load balancer idle timeout (60s)
+KEEPALIVE = int(os.getenv("KEEPALIVE_TIMEOUT", 75))
+BACKLOG = int(os.getenv("BACKLOG", 2048))
+# Time given to in-flight requests to finish on shutdown
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+# Where workers share their metrics (a temporary directory unless set)
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+# First global-ID worker id of this host, workers use ID_WORKER_ID + their slot
+ID_WORKER_ID = int(os.getenv("ID_WORKER_ID", 0))
+
+LOOP = "uvloop" if _installed("uvloop") else "asyncio"
+HTTP = "httptools" if _installed("httptools") else "h11"
+
+
+def pre_fork(server, worker):
+    """Give the new worker the lowest slot no live worker holds (runs in the master)."""
+    taken = {getattr(live, "slot", None) for live in server.WORKERS.values()}
+    worker.slot = next(slot for slot in itertools.count() if slot not in taken)
+
+def post_fork(server, worker):
+    """Give each worker its own connection pools and ID generator."""
+    from app.db.database import shard_router
+    from app.db.sharding import IdGenerator
+
+    # Connections opened by the preloaded app belong to the master, never reuse them
+    for shard_engine in shard_router.engines:
+        shard_engine.dispose(close=False)
+    # Raises (and the worker fails to boot) if ID_WORKER_ID + slot is out of range
+    shard_router.ids = IdGenerator(ID_WORKER_ID + worker.slot)
+
+def child_exit(server, worker):
+    """Fold an exited worker's metrics into the aggregate instead of dropping its live gauges."""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+def on_exit(server):
+    """Remove the metrics directory if it is the temporary one."""
+    if not PROMETHEUS_MULTIPROC_DIR:
+        shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+
+
+def _reset_metrics_dir():
+    """Give the workers a metrics directory without old samples before the app (and prometheus_client) is loaded.
+
+    Samples left there by a previous run would otherwise be added to this one's. Only
+    prometheus_client's own ``*.db`` files are removed from a configured directory.
+    """
+    if PROMETHEUS_MULTIPROC_DIR:
+        os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+        for sample_file in glob.glob(os.path.join(PROMETHEUS_MULTIPROC_DIR, "*.db")):
+            os.remove(sample_file)
+    else:
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="prometheus-")
+
+def _worker_class():
+    try:
+        from uvicorn_worker import UvicornWorker
+    except ImportError:
+        from uvicorn.workers import UvicornWorker
+
+    class Worker(UvicornWorker):
+        CONFIG_KWARGS = {
+            "loop": LOOP,
+            "http": HTTP,
+            "lifespan": "on",
+            "timeout_graceful_shutdown": GRACEFUL_TIMEOUT,
+        }
+
+    return Worker
+
+def run_gunicorn():
+    """Serve the preloaded app with gunicorn, one uvicorn worker per core."""
+    from gunicorn.app.base import BaseApplication
+
+    class Server(BaseApplication):
+        def load_config(self):
+            options = {
+                "bind": f"{HOST}:{PORT}",
+                "workers": WORKERS,
+                "worker_class": _worker_class(),
+                "preload_app": True,
+                "keepalive": KEEPALIVE,
+                "backlog": BACKLOG,
+                "graceful_timeout": GRACEFUL_TIMEOUT,
+                "pre_fork": pre_fork,
+                "post_fork": post_fork,
+                "child_exit": child_exit,
+                "on_exit": on_exit,
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app.main import app
+            return app
+
+    _reset_metrics_dir()
+    Server().run()
+
+def run_uvicorn():
+    """Serve a single uvicorn worker (no gunicorn, e.g. on Windows)."""
+    import uvicorn
+
+    # uvicorn has no per-worker hook to hand out distinct global-ID worker ids
+    if WORKERS > 1:
+        if int(os.getenv("WEB_CONCURRENCY", 0)):
+            raise SystemExit("Install gunicorn to run more than one worker (WEB_CONCURRENCY=1 otherwise)")
+        logging.getLogger(__name__).warning("gunicorn is not installed, running a single worker instead of %d", WORKERS)
+
+    uvicorn.run(
+        "app.main:app",
+        host=HOST,
+        port=PORT,
+        loop=LOOP,
+        http=HTTP,
+        timeout_keep_alive=KEEPALIVE,
+        backlog=BACKLOG,
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT,
+    )
+
+def main():
+    from app.db.sharding import MAX_WORKERS
+
+    if ID_WORKER_ID < 0 or ID_WORKER_ID + WORKERS > MAX_WORKERS:
+        raise SystemExit(f"ID_WORKER_ID ({ID_WORKER_ID}) + workers ({WORKERS}) must not exceed {MAX_WORKERS}")
+
+    if _installed("gunicorn"):
+        run_gunicorn()
+    else:
+        run_uvicorn()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Orders per second with and without group commit: ``python -m benchmarks.group_commit``.
+
+Simulates concurrent create_order calls with a pool of threads, comparing the
+default path (one session, commit and refresh per order) against GroupCommitter.
+Uses a throwaway SQLite file unless --database-url is given.
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db.group_commit import GroupCommitter
+from app.db.sharding import IdGenerator
+from app.models import Base, User, Order
+
+ids = IdGenerator(worker_id=0)
+
+
+def per_order_commit(engine, user_id: int, orders: int, concurrency: int):
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def create_order(_):
+        db = SessionLocal()
+        try:
+            new_order = Order(id=ids.next_id(0), user_id=user_id, total_amount=Decimal("10.00"))
+            db.add(new_order)
+            db.commit()
+            db.refresh(new_order)
+        finally:
+            db.close()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(create_order, range(orders)))
+
+def group_commit(engine, user_id: int, orders: int, concurrency: int, window_ms: float, max_batch: int):
+    committer = GroupCommitter(Order.__table__, [engine], window_ms=window_ms, max_batch=max_batch)
+
+    def create_order(_):
+        committer.insert(0, {"id": ids.next_id(0), "user_id": user_id, "total_amount": Decimal("10.00")})
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(create_order, range(orders)))
+
+def measure(name: str, run, orders: int):
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {orders / elapsed:>10.0f} orders/s  ({elapsed:.2f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", help="Database to write to (default: a temporary SQLite file)")
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=40, help="Concurrent callers (FastAPI's threadpool has 40)")
+    parser.add_argument("--window-ms", type=float, default=5)
+    parser.add_argument("--max-batch", type=int, default=100)
+    args = parser.parse_args()
+
+    path = None
+    if args.database_url:
+        url = args.database_url
+    else:
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        url = f"sqlite:///{path}"
+
+    connect_args = {"check_same_thread": False, "timeout": 60} if url.startswith("sqlite") else {}
+    engine = create_engine(url, connect_args=connect_args, pool_size=args.concurrency, max_overflow=0)
+    Base.metadata.create_all(bind=engine)
+
+    user_id = ids.next_id(0)
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), {"id": user_id, "username": f"bench-{user_id}", "email": f"bench-{user_id}@example.com", "hashed_password": "-", "role": "customer"})
+
+    print(f"{args.orders} orders, {args.concurrency} concurrent callers, {url}")
+    measure("per-order commit", lambda: per_order_commit(engine, user_id, args.orders, args.concurrency), args.orders)
+    measure(
+        f"group commit ({args.window_ms:g}ms, <={args.max_batch})",
+        lambda: group_commit(engine, user_id, args.orders, args.concurrency, args.window_ms, args.max_batch),
+        args.orders,
+    )
+
+    with engine.begin() as connection:
+        connection.execute(Order.__table__.delete().where(Order.user_id == user_id))
+        connection.execute(User.__table__.delete().where(User.id == user_id))
+    engine.dispose()
+    if path:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
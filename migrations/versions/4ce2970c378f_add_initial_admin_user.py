@@ -7,12 +7,11 @@ Create Date: 2025-03-14 10:49:19.837899
 """
 from typing import Sequence, Union
 
-from alembic import op
+from alembic import context, op
 import sqlalchemy as sa
 
 from sqlalchemy import Table, Column, Integer, String
 from sqlalchemy.sql import text
-from app.db.database import engine
 from passlib.context import CryptContext
 
 # revision identifiers, used by Alembic.
@@ -23,29 +22,33 @@ depends_on: Union[str, Sequence[str], None] = None
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+def _is_first_shard() -> bool:
+    """Only shard 0 gets the admin user (`alembic -x shard=N upgrade head` for the others)."""
+    return context.get_x_argument(as_dictionary=True).get("shard", "0") == "0"
+
 def upgrade():
     """Add an initial admin user to the users table."""
+    if not _is_first_shard():
+        return
+
     hashed_password = pwd_context.hash("admin123")  # Set a secure password
     
-    conn = engine.connect()
-    conn.execute(
+    # Run on the connection Alembic is migrating, not the app's engine
+    op.execute(
         text(
             "INSERT INTO users (username, email, hashed_password, role) "
             "VALUES (:username, :email, :password, :role)"
-        ),
-        {
-            "username": "admin",
-            "email": "admin@example.com",
-            "password": hashed_password,
-            "role": "admin"
-        }
+        ).bindparams(
+            username="admin",
+            email="admin@example.com",
+            password=hashed_password,
+            role="admin",
+        )
     )
-    conn.commit()
-    conn.close()
 
 def downgrade():
     """Remove the initial admin user if the migration is rolled back."""
-    conn = engine.connect()
-    conn.execute(text("DELETE FROM users WHERE username = 'admin'"))
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    if not _is_first_shard():
+        return
+
+    op.execute(text("DELETE FROM users WHERE username = 'admin'"))
\ No newline at end of file
@@ -0,0 +1,32 @@
+"""Use global bigint ids for sharding
+
+Revision ID: b7d41f0c2a9e
+Revises: 4ce2970c378f
+Create Date: 2026-10-19 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d41f0c2a9e'
+down_revision: Union[str, None] = '4ce2970c378f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Widen user and order ids to hold shard-encoded global ids."""
+    op.alter_column('orders', 'user_id', existing_type=sa.Integer(), type_=sa.BigInteger(), existing_nullable=False)
+    op.alter_column('orders', 'id', existing_type=sa.Integer(), type_=sa.BigInteger(), existing_nullable=False)
+    op.alter_column('users', 'id', existing_type=sa.Integer(), type_=sa.BigInteger(), existing_nullable=False)
+
+
+def downgrade() -> None:
+    """Narrow ids back to integers (fails if global ids were already issued)."""
+    op.alter_column('users', 'id', existing_type=sa.BigInteger(), type_=sa.Integer(), existing_nullable=False)
+    op.alter_column('orders', 'id', existing_type=sa.BigInteger(), type_=sa.Integer(), existing_nullable=False)
+    op.alter_column('orders', 'user_id', existing_type=sa.BigInteger(), type_=sa.Integer(), existing_nullable=False)
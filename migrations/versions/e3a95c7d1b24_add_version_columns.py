@@ -0,0 +1,30 @@
+"""Add version columns
+
+Revision ID: e3a95c7d1b24
+Revises: b7d41f0c2a9e
+Create Date: 2026-10-19 11:02:17.530961
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a95c7d1b24'
+down_revision: Union[str, None] = 'b7d41f0c2a9e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add optimistic concurrency version columns to users and orders."""
+    op.add_column('users', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('orders', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Drop the version columns."""
+    op.drop_column('orders', 'version')
+    op.drop_column('users', 'version')
@@ -0,0 +1,97 @@
+"""Run the API against three throwaway SQLite shards.
+
+The environment and the JWT keys are set up before anything from ``app`` is
+imported, since the database engines and keys are created at import time.
+"""
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+SHARD_COUNT = 3
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+_workdir = Path(tempfile.mkdtemp(prefix="user-order-api-tests-"))
+os.environ["SHARD_DATABASE_URLS"] = ",".join(f"sqlite:///{_workdir / f'shard{shard}.db'}" for shard in range(SHARD_COUNT))
+os.environ["GROUP_COMMIT"] = "false"
+os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)  # Single process, metrics stay in memory
+
+def _write_jwt_keys(directory: Path):
+    """Create the RS256 key pair app.auth.key_manager loads from .ssh/."""
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    directory.mkdir()
+    (directory / "jwtRS256").write_bytes(
+        private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    )
+    (directory / "jwtRS256.pem").write_bytes(
+        private_key.public_key().public_bytes(serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo)
+    )
+
+_write_jwt_keys(_workdir / ".ssh")
+_cwd = os.getcwd()
+os.chdir(_workdir)  # key_manager reads the keys relative to the working directory
+try:
+    from app.main import app
+    from app.db.database import shard_router
+    from app.models import User, Order
+    from app.auth.auth import hash_password
+finally:
+    os.chdir(_cwd)
+
+from fastapi.testclient import TestClient
+
+ADMIN_ID = 1  # A pre-sharding (legacy) ID, so the admin lives on shard 0
+
+
+def pytest_sessionfinish(session, exitstatus):
+    for shard_engine in shard_router.engines:
+        shard_engine.dispose()
+    shutil.rmtree(_workdir, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+@pytest.fixture(autouse=True)
+def clean_shards():
+    """Empty every shard after each test."""
+    yield
+    for shard_engine in shard_router.engines:
+        with shard_engine.begin() as connection:
+            connection.execute(Order.__table__.delete())
+            connection.execute(User.__table__.delete())
+
+def login(client, email: str, password: str) -> dict:
+    response = client.post("/auth/login", json={"email": email, "password": password})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture
+def admin_headers(client):
+    db = shard_router.session(0)
+    try:
+        db.add(User(id=ADMIN_ID, username="admin", email="admin@example.com", hashed_password=hash_password("admin123"), role="admin"))
+        db.commit()
+    finally:
+        db.close()
+    return login(client, "admin@example.com", "admin123")
+
+@pytest.fixture
+def create_customer(client, admin_headers):
+    """Create a customer through the API and return its (integer) ID."""
+    def create(name: str) -> int:
+        response = client.post(
+            "/users/",
+            json={"username": name, "email": f"{name}@example.com", "password": "secret", "role": "customer"},
+            headers=admin_headers,
+        )
+        assert response.status_code == 201, response.text
+        return int(response.json()["id"])
+    return create
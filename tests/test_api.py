@@ -0,0 +1,213 @@
+import pytest
+from sqlalchemy import select
+from app.db.database import shard_router
+from app.models import User, Order
+from app.routes.batch import MAX_BATCH_IDS
+from conftest import ADMIN_ID, SHARD_COUNT, login
+
+
+def _shards_holding(table, row_id: int) -> list[int]:
+    """Shards that have a row with the given ID."""
+    shards = []
+    for shard, shard_engine in enumerate(shard_router.engines):
+        with shard_engine.connect() as connection:
+            if connection.execute(select(table.c.id).where(table.c.id == row_id)).first():
+                shards.append(shard)
+    return shards
+
+
+def test_new_users_are_spread_over_shards_and_routed_by_id(client, admin_headers, create_customer):
+    user_ids = [create_customer(f"customer{n}") for n in range(SHARD_COUNT)]
+
+    assert sorted(shard_router.shard_for_id(user_id) for user_id in user_ids) == list(range(SHARD_COUNT))
+    for user_id in user_ids:
+        assert _shards_holding(User.__table__, user_id) == [shard_router.shard_for_id(user_id)]
+        response = client.get(f"/users/{user_id}", headers=admin_headers)
+        assert response.status_code == 200
+        assert response.json()["id"] == str(user_id)
+
+def test_orders_are_stored_with_their_owner(client, admin_headers, create_customer):
+    for n in range(SHARD_COUNT):
+        user_id = create_customer(f"buyer{n}")
+        headers = login(client, f"buyer{n}@example.com", "secret")
+
+        response = client.post("/orders/", json={"total_amount": 12.5}, headers=headers)
+        assert response.status_code == 200, response.text
+        order_id = int(response.json()["order_id"])
+
+        assert _shards_holding(Order.__table__, order_id) == [shard_router.shard_for_id(user_id)]
+        order = client.get(f"/orders/{order_id}", headers=headers).json()
+        assert order["user_id"] == str(user_id)
+
+def test_admin_listing_pages_across_shards(client, admin_headers, create_customer):
+    user_ids = [ADMIN_ID] + [create_customer(f"page{n}") for n in range(5)]
+
+    pages = [
+        client.get(f"/users/?skip={skip}&limit=2", headers=admin_headers).json()
+        for skip in (0, 2, 4, 6)
+    ]
+
+    assert [len(page) for page in pages] == [2, 2, 2, 0]
+    assert [int(user["id"]) for page in pages for user in page] == sorted(user_ids)
+
+@pytest.mark.parametrize("query", ["skip=-1", "limit=0", "limit=5000"])
+def test_invalid_paging_is_rejected(client, admin_headers, query):
+    assert client.get(f"/users/?{query}", headers=admin_headers).status_code == 422
+    assert client.get(f"/orders/?{query}", headers=admin_headers).status_code == 422
+
+def test_email_and_username_are_unique_across_shards(client):
+    first = {"username": "alice", "email": "alice@example.com", "password": "secret"}
+    assert client.post("/auth/register", json=first).status_code == 200
+
+    same_email = client.post("/auth/register", json={**first, "username": "alice2"})
+    same_username = client.post("/auth/register", json={**first, "email": "alice2@example.com"})
+
+    assert (same_email.status_code, same_email.json()["detail"]) == (400, "Email already registered")
+    assert (same_username.status_code, same_username.json()["detail"]) == (400, "Username already taken")
+
+def test_customer_batch_get_only_returns_themselves(client, create_customer):
+    own_id = create_customer("carol")
+    other_id = create_customer("dave")
+    headers = login(client, "carol@example.com", "secret")
+
+    assert client.get(f"/users/?ids={other_id}", headers=headers).json() == []
+    users = client.get(f"/users/?ids={other_id}&ids={own_id}", headers=headers).json()
+    assert [user["id"] for user in users] == [str(own_id)]
+
+def _create_order(client, headers) -> str:
+    response = client.post("/orders/", json={"total_amount": 20}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["order_id"]
+
+def test_order_update_checks_if_match(client, create_customer):
+    create_customer("olivia")
+    headers = login(client, "olivia@example.com", "secret")
+    order_id = _create_order(client, headers)
+    assert client.get(f"/orders/{order_id}", headers=headers).headers["ETag"] == '"1"'
+
+    updated = client.put(f"/orders/{order_id}", json={"status": "paid"}, headers={**headers, "If-Match": '"1"'})
+    assert updated.status_code == 200
+    assert (updated.json()["version"], updated.headers["ETag"]) == (2, '"2"')
+
+    stale = client.put(f"/orders/{order_id}", json={"status": "shipped"}, headers={**headers, "If-Match": '"1"'})
+    assert (stale.status_code, stale.headers["ETag"]) == (409, '"2"')
+    assert client.get(f"/orders/{order_id}", headers=headers).json()["status"] == "paid"
+
+    unconditional = client.put(f"/orders/{order_id}", json={"status": "shipped"}, headers=headers)
+    assert (unconditional.status_code, unconditional.json()["version"]) == (200, 3)
+
+    weak = client.put(f"/orders/{order_id}", json={"status": "delivered"}, headers={**headers, "If-Match": 'W/"3"'})
+    assert weak.status_code == 200
+
+@pytest.mark.parametrize("if_match", ['"abc"', "3.5", '"-1"'])
+def test_malformed_if_match_is_rejected(client, admin_headers, if_match):
+    response = client.put(f"/users/{ADMIN_ID}", json={"username": "admin", "email": "admin@example.com"}, headers={**admin_headers, "If-Match": if_match})
+    assert response.status_code == 400
+
+def test_order_update_tells_missing_forbidden_and_stale_apart(client, admin_headers, create_customer):
+    create_customer("owner")
+    create_customer("other")
+    order_id = _create_order(client, login(client, "owner@example.com", "secret"))
+    other_headers = login(client, "other@example.com", "secret")
+    missing_id = shard_router.next_id(0)
+
+    assert client.put(f"/orders/{missing_id}", json={"status": "paid"}, headers=admin_headers).status_code == 404
+    # A customer learns the order is not theirs, even when their version is stale too
+    forbidden = client.put(f"/orders/{order_id}", json={"status": "paid"}, headers={**other_headers, "If-Match": '"7"'})
+    assert forbidden.status_code == 403
+    stale = client.put(f"/orders/{order_id}", json={"status": "paid"}, headers={**admin_headers, "If-Match": '"7"'})
+    assert (stale.status_code, stale.headers["ETag"]) == (409, '"1"')
+
+def test_profile_update_checks_if_match(client, create_customer):
+    create_customer("paula")
+    headers = login(client, "paula@example.com", "secret")
+    assert client.get("/users/me", headers=headers).headers["ETag"] == '"1"'
+    profile = {"username": "paula", "email": "paula@example.com"}
+
+    updated = client.put("/users/me", json={**profile, "username": "paula2"}, headers={**headers, "If-Match": '"1"'})
+    assert (updated.status_code, updated.headers["ETag"]) == (200, '"2"')
+
+    stale = client.put("/users/me", json=profile, headers={**headers, "If-Match": '"1"'})
+    assert (stale.status_code, stale.headers["ETag"]) == (409, '"2"')
+
+    unconditional = client.put("/users/me", json=profile, headers=headers)
+    assert (unconditional.status_code, unconditional.json()["version"]) == (200, 3)
+
+def test_user_update_by_id_checks_if_match(client, admin_headers, create_customer):
+    user_id = create_customer("quinn")
+    profile = {"username": "quinn", "email": "quinn@example.com"}
+    assert client.get(f"/users/{user_id}", headers=admin_headers).headers["ETag"] == '"1"'
+
+    updated = client.put(f"/users/{user_id}", json=profile, headers={**admin_headers, "If-Match": '"1"'})
+    assert (updated.status_code, updated.headers["ETag"]) == (200, '"2"')
+
+    stale = client.put(f"/users/{user_id}", json=profile, headers={**admin_headers, "If-Match": '"1"'})
+    assert (stale.status_code, stale.headers["ETag"]) == (409, '"2"')
+
+    assert client.put(f"/users/{user_id}", json=profile, headers=admin_headers).json()["version"] == 3
+    missing = client.put(f"/users/{shard_router.next_id(1)}", json={"username": "nobody", "email": "nobody@example.com"}, headers=admin_headers)
+    assert missing.status_code == 404
+
+def test_customer_cannot_update_another_user(client, create_customer):
+    create_customer("rita")
+    other_id = create_customer("sam")
+    headers = login(client, "rita@example.com", "secret")
+
+    response = client.put(f"/users/{other_id}", json={"username": "sam", "email": "sam@example.com"}, headers=headers)
+    assert response.status_code == 403
+
+def _orders_of_new_customers(client, create_customer, count: int) -> list[tuple[str, str]]:
+    """Create one customer with one order per shard, returning (user_id, order_id) pairs."""
+    owned = []
+    for n in range(count):
+        user_id = create_customer(f"batch{n}")
+        owned.append((str(user_id), _create_order(client, login(client, f"batch{n}@example.com", "secret"))))
+    return owned
+
+def _ids_query(ids) -> str:
+    return "&".join(f"ids={row_id}" for row_id in ids)
+
+def test_admin_batch_get_orders_across_shards_in_request_order(client, admin_headers, create_customer):
+    owned = _orders_of_new_customers(client, create_customer, SHARD_COUNT)
+    order_ids = [order_id for _, order_id in reversed(owned)]
+    missing_id = shard_router.next_id(1)
+
+    response = client.get(f"/orders/?{_ids_query([order_ids[0], missing_id, *order_ids[1:], order_ids[0]])}", headers=admin_headers)
+
+    assert response.status_code == 200
+    orders = response.json()
+    assert [order["id"] for order in orders] == order_ids
+    assert all("user" not in order for order in orders)
+    assert len({shard_router.shard_for_id(int(order_id)) for order_id in order_ids}) == SHARD_COUNT
+
+def test_customer_batch_get_orders_only_returns_their_own(client, create_customer):
+    owned = _orders_of_new_customers(client, create_customer, 2)
+    headers = login(client, "batch0@example.com", "secret")
+
+    orders = client.get(f"/orders/?{_ids_query(order_id for _, order_id in owned)}", headers=headers).json()
+
+    assert [order["id"] for order in orders] == [owned[0][1]]
+
+def test_batch_get_orders_can_embed_their_users(client, admin_headers, create_customer):
+    owned = _orders_of_new_customers(client, create_customer, 2)
+
+    orders = client.get(f"/orders/?{_ids_query(order_id for _, order_id in owned)}&include_user=true", headers=admin_headers).json()
+
+    assert [(order["user"]["id"], order["id"]) for order in orders] == owned
+    assert orders[0]["user"]["username"] == "batch0"
+
+def test_batch_get_is_limited(client, admin_headers):
+    too_many = range(1, MAX_BATCH_IDS + 2)
+
+    assert client.get(f"/orders/?{_ids_query(too_many)}", headers=admin_headers).status_code == 400
+    assert client.get(f"/users/?{_ids_query(too_many)}", headers=admin_headers).status_code == 400
+    # Duplicates don't count against the limit
+    assert client.get(f"/orders/?{_ids_query([1] * (MAX_BATCH_IDS + 1))}", headers=admin_headers).status_code == 200
+
+def test_user_orders_only_lists_that_users_orders(client, admin_headers, create_customer):
+    owned = _orders_of_new_customers(client, create_customer, SHARD_COUNT + 1)  # Two customers share a shard
+    user_id, order_id = owned[0]
+
+    orders = client.get(f"/users/{user_id}/orders", headers=admin_headers).json()
+
+    assert [(order["user_id"], order["id"]) for order in orders] == [(user_id, order_id)]
@@ -0,0 +1,60 @@
+import csv
+from app import bulk_import
+from app.db.database import shard_router
+from app.models import User
+
+CSV_HEADERS = {"Content-Type": "text/csv"}
+
+
+def test_import_users_across_shards(client, admin_headers):
+    body = "username,email,password\nerin,erin@example.com,secret\nfrank,not-an-email,secret\n"
+
+    report = client.post("/users/import", content=body, headers={**admin_headers, **CSV_HEADERS}).json()
+
+    assert report["imported"] == 1
+    assert [reject["line"] for reject in report["rejects"]] == [3]
+
+def test_non_utf8_body_is_rejected_not_a_server_error(client, admin_headers):
+    body = "username,email,password\ngina,gina@example.com,secret\n".encode() + b"h\xe9l\xe8ne,helene@example.com,secret\n"
+
+    response = client.post("/users/import", content=body, headers={**admin_headers, **CSV_HEADERS})
+
+    assert response.status_code == 200
+    report = response.json()
+    assert report["rejected"] == 1
+    assert "not valid UTF-8" in report["rejects"][0]["errors"][0]
+
+def test_malformed_csv_is_rejected_not_a_server_error(client, admin_headers):
+    oversized = "x" * (csv.field_size_limit() + 1)
+    body = f"username,email,password\nhank,hank@example.com,secret\n{oversized},ivan@example.com,secret\n"
+
+    response = client.post("/users/import", content=body, headers={**admin_headers, **CSV_HEADERS})
+
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["imported"], report["rejected"]) == (1, 1)
+    assert report["rejects"][0]["line"] == 3
+    assert "Malformed CSV" in report["rejects"][0]["errors"][0]
+
+def test_database_error_rejects_only_the_bad_rows(admin_headers):
+    rows = [
+        (line, {"id": shard_router.next_id(0), "username": f"user{line}", "email": f"user{line}@example.com", "hashed_password": "-", "role": "customer"})
+        for line in range(2, 7)
+    ]
+    rows[2][1]["email"] = "admin@example.com"  # Violates the unique email on shard 0
+    report = bulk_import.ImportReport()
+
+    bulk_import._write(User.__table__, {0: rows}, report)
+
+    assert (report.imported, report.rejected) == (4, 1)
+    assert report.rejects[0]["line"] == 4
+    assert report.rejects[0]["errors"][0].startswith("Database error")
+
+def test_values_longer_than_their_columns_are_rejected(client, admin_headers):
+    body = f"username,email,password\n{'x' * 256},long@example.com,secret\nshort,short@example.com,secret\n"
+
+    report = client.post("/users/import", content=body, headers={**admin_headers, **CSV_HEADERS}).json()
+
+    assert report["imported"] == 1
+    assert report["rejects"][0]["line"] == 2
+    assert report["rejects"][0]["errors"][0].startswith("username:")
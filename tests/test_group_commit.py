@@ -0,0 +1,92 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.exc import IntegrityError
+from app.db.group_commit import GroupCommitter
+from app.db.sharding import IdGenerator
+from app.models import Base, User, Order
+
+ids = IdGenerator(worker_id=1)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'orders.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), {"id": 1, "username": "owner", "email": "owner@example.com", "hashed_password": "-"})
+    yield engine
+    engine.dispose()
+
+def _committer(engine, **options):
+    """A GroupCommitter on one shard that records the size of every transaction it writes."""
+    committer = GroupCommitter(Order.__table__, [engine], **options)
+    batcher = committer._batchers[0]
+    batcher.batch_sizes = []
+    insert_rows = batcher._insert
+
+    def recording_insert(rows):
+        batcher.batch_sizes.append(len(rows))
+        insert_rows(rows)
+
+    batcher._insert = recording_insert
+    return committer, batcher.batch_sizes
+
+def _insert_concurrently(committer, rows: list[dict]) -> list:
+    """Insert every row from its own caller thread, all starting at once. Returns each caller's exception or None."""
+    start = threading.Barrier(len(rows))
+
+    def call(row):
+        start.wait()
+        try:
+            committer.insert(0, row)
+        except Exception as e:
+            return e
+        return None
+
+    with ThreadPoolExecutor(max_workers=len(rows)) as executor:
+        return list(executor.map(call, rows))
+
+def _order(order_id: int = None) -> dict:
+    return {"id": order_id or ids.next_id(0), "user_id": 1, "total_amount": Decimal("10.00")}
+
+def _stored_ids(engine) -> set:
+    with engine.connect() as connection:
+        return set(connection.execute(select(Order.id)).scalars())
+
+
+def test_concurrent_inserts_share_commits(engine):
+    committer, batch_sizes = _committer(engine, window_ms=100, max_batch=100)
+    rows = [_order() for _ in range(30)]
+
+    errors = _insert_concurrently(committer, rows)
+
+    assert errors == [None] * len(rows)
+    assert _stored_ids(engine) == {row["id"] for row in rows}
+    assert sum(batch_sizes) == len(rows)
+    assert len(batch_sizes) < len(rows)
+
+def test_batches_are_capped_at_max_batch(engine):
+    committer, batch_sizes = _committer(engine, window_ms=200, max_batch=4)
+    rows = [_order() for _ in range(12)]
+
+    assert _insert_concurrently(committer, rows) == [None] * len(rows)
+
+    assert sum(batch_sizes) == len(rows)
+    assert max(batch_sizes) == 4
+
+def test_failing_row_only_fails_its_caller(engine):
+    existing = _order()
+    committer, batch_sizes = _committer(engine, window_ms=100, max_batch=100)
+    committer.insert(0, existing)
+    rows = [_order() for _ in range(9)] + [_order(existing["id"])]  # Duplicate primary key
+
+    errors = _insert_concurrently(committer, rows)
+
+    assert errors[:-1] == [None] * 9
+    assert isinstance(errors[-1], IntegrityError)
+    assert _stored_ids(engine) == {existing["id"]} | {row["id"] for row in rows[:-1]}
+    assert max(batch_sizes) > 1  # The bad row was in a shared batch and retried on its own
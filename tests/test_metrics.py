@@ -0,0 +1,8 @@
+def test_metrics_count_requests_by_route_template(client, admin_headers):
+    client.get("/orders/12345", headers=admin_headers)
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_requests_total{method="GET",route="/orders/{order_id}",status="404"}' in response.text
@@ -0,0 +1,46 @@
+import pytest
+from app.db.sharding import (
+    LEGACY_ID_LIMIT,
+    MAX_WORKERS,
+    SEQUENCE_BITS,
+    IdGenerator,
+    ShardRouter,
+    shard_from_id,
+)
+
+
+def test_ids_encode_shard_and_worker():
+    ids = IdGenerator(worker_id=5)
+    generated = [ids.next_id(shard) for shard in (0, 1, 2, 63)]
+
+    assert [shard_from_id(row_id) for row_id in generated] == [0, 1, 2, 63]
+    assert all((row_id >> SEQUENCE_BITS) & (MAX_WORKERS - 1) == 5 for row_id in generated)
+    assert generated == sorted(generated)
+    assert len(set(generated)) == len(generated)
+
+@pytest.mark.parametrize("legacy_id", [1, 70000, 1 << 30, LEGACY_ID_LIMIT - 1])
+def test_legacy_ids_map_to_shard_zero(legacy_id):
+    assert shard_from_id(legacy_id) == 0
+
+def test_generated_ids_are_above_legacy_limit():
+    assert IdGenerator(worker_id=0).next_id(0) >= LEGACY_ID_LIMIT
+
+@pytest.mark.parametrize("worker_id", [-1, MAX_WORKERS])
+def test_worker_id_out_of_range(worker_id):
+    with pytest.raises(ValueError):
+        IdGenerator(worker_id)
+
+def test_router_wraps_shard_index():
+    router = ShardRouter(["sqlite://", "sqlite://"])
+    row_id = router.next_id(3)
+
+    assert router.shard_for_id(row_id) == 1
+    assert router.shard_for_id(42) == 0
+
+def test_get_many_without_ids_queries_nothing():
+    router = ShardRouter(["sqlite://", "sqlite://"])
+
+    def query_fn(db, shard_ids):
+        raise AssertionError("no shard should be queried")
+
+    assert router.get_many([object(), object()], [], query_fn) == []